@@ -1,61 +1,159 @@
 import openai
 import pytesseract
 from PIL import Image
-import json
+import asyncio
+import concurrent.futures
+import hashlib
 import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
 from typing import Dict, Any, Optional, List
+from pydantic import BaseModel, Field
 from config import settings
+from database import SessionLocal
+from models import NLPCache
 import re
 from datetime import datetime
 
+# Optional: tesserocr keeps a long-lived Tesseract instance in-process,
+# avoiding the subprocess fork + traineddata reload that pytesseract pays per call
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# Optional: pyvips decodes sequentially and resizes/grayscales with SIMD,
+# never holding a full RGB buffer in Python the way a PIL decode does
+try:
+    import pyvips
+    PYVIPS_AVAILABLE = True
+except ImportError:
+    PYVIPS_AVAILABLE = False
+
+# Optional: tiktoken lets us trim prompts by token count instead of a crude
+# character cap (loading the encoding can also fail offline on first use)
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-3.5-turbo")
+except Exception:
+    _ENCODING = None
+
 logger = logging.getLogger(__name__)
 
-# Configure OpenAI
-if settings.openai_api_key:
-    openai.api_key = settings.openai_api_key
+# Entity-extraction patterns, compiled once at import instead of on every
+# fallback-analysis call
+_DATE_RE = re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b')
+_AMOUNT_RE = re.compile(r'\$[\d,]+\.?\d*|\b\d+\.\d{2}\b')
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# Document-type keyword buckets in priority order (first bucket wins, as the
+# old if/elif chain did); all keywords are folded into one scan of the text
+_DOCUMENT_TYPE_KEYWORDS = (
+    ("invoice", ('invoice', 'bill', 'payment', 'amount due')),
+    ("contract", ('contract', 'agreement', 'terms', 'conditions')),
+    ("report", ('report', 'analysis', 'findings', 'conclusion')),
+    ("resume", ('resume', 'cv', 'curriculum vitae', 'experience')),
+)
+_KEYWORD_TO_TYPE = {
+    keyword: (priority, doc_type)
+    for priority, (doc_type, keywords) in enumerate(_DOCUMENT_TYPE_KEYWORDS)
+    for keyword in keywords
+}
+_DOCUMENT_TYPE_RE = re.compile(
+    '|'.join(re.escape(k) for k in sorted(_KEYWORD_TO_TYPE, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# Sentiment keywords, matched in a single case-insensitive pass instead of
+# one full-text scan per word; longest-first so e.g. "unhappy" wins over "happy"
+_POSITIVE_WORDS = frozenset(['good', 'great', 'excellent', 'positive', 'success', 'happy', 'pleased'])
+_NEGATIVE_WORDS = frozenset(['bad', 'terrible', 'negative', 'failure', 'unhappy', 'disappointed', 'problem'])
+_SENTIMENT_RE = re.compile(
+    '|'.join(sorted(_POSITIVE_WORDS | _NEGATIVE_WORDS, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# Shared OpenAI client and hot-path constants, captured once at import so
+# per-request code avoids repeated pydantic settings lookups and pool
+# workers never rebuild the client per DocumentProcessor
+_OPENAI_CLIENT = openai.AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+_OPENAI_CONCURRENCY = settings.openai_concurrency
+_MAX_TEXT = 4000  # character fallback cap when tiktoken is unavailable
+_MAX_PROMPT_TOKENS = 3500  # leaves headroom for the system + schema prompt
+
+
+def _truncate_for_model(text: str) -> str:
+    """Trim document text to the model's token budget
+
+    Character slicing wastes roughly a quarter of the context window on
+    English-like text (tokens ~ chars/4); encoding with tiktoken fills the
+    budget precisely. Falls back to the character cap without tiktoken.
+    """
+    if _ENCODING is None:
+        return text[:_MAX_TEXT]
+    ids = _ENCODING.encode(text)
+    if len(ids) <= _MAX_PROMPT_TOKENS:
+        return text
+    return _ENCODING.decode(ids[:_MAX_PROMPT_TOKENS])
+
+
+# Longest image edge fed to Tesseract; larger scans are downscaled first.
+# 1600 px keeps text above Tesseract's recommended DPI on typical pages
+OCR_MAX_EDGE = 1600
 
 
 class OCRService:
     """Optical Character Recognition service using Tesseract"""
-    
+
     def __init__(self):
         self.tesseract_config = '--oem 3 --psm 6'
-    
+        self.api = None
+        if TESSEROCR_AVAILABLE:
+            self.api = PyTessBaseAPI(lang="eng", psm=PSM.SINGLE_BLOCK, oem=OEM.DEFAULT)
+            # The underlying C++ API is not reentrant
+            self.api_lock = threading.Lock()
+
     def extract_text(self, image_path: str) -> Dict[str, Any]:
         """
         Extract text from image using OCR
-        
+
         Args:
             image_path: Path to the image file
-            
+
         Returns:
             Dictionary containing extracted text and confidence score
         """
         try:
-            # Open and process image
-            image = Image.open(image_path)
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Extract text with confidence data
-            data = pytesseract.image_to_data(image, config=self.tesseract_config, output_type=pytesseract.Output.DICT)
-            
+            # Open, downscale and grayscale the image for recognition
+            image = self._load_image(image_path)
+
+            if self.api is not None:
+                # Reuse the persistent Tesseract instance: one SetImage,
+                # then text + per-word confidences without any subprocess
+                with self.api_lock:
+                    self.api.SetImage(image)
+                    text = self.api.GetUTF8Text()
+                    confidences = [conf for conf in self.api.AllWordConfidences() if conf > 0]
+            else:
+                # Fallback: a single pytesseract subprocess; the text is
+                # reassembled from image_to_data so no second image_to_string
+                # invocation (and Tesseract re-init) is needed
+                data = pytesseract.image_to_data(image, config=self.tesseract_config, output_type=pytesseract.Output.DICT)
+                text, confidences = self._assemble_text(data)
+
             # Calculate average confidence
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            # Extract text
-            text = pytesseract.image_to_string(image, config=self.tesseract_config)
-            
+
             return {
                 "text": text.strip(),
                 "confidence": round(avg_confidence, 2),
                 "word_count": len(text.split()),
                 "character_count": len(text)
             }
-            
+
         except Exception as e:
             logger.error(f"OCR extraction failed: {e}")
             return {
@@ -66,26 +164,183 @@ class OCRService:
                 "error": str(e)
             }
 
+    @staticmethod
+    def _assemble_text(data: Dict[str, List]) -> tuple:
+        """
+        Rebuild document text and word confidences from image_to_data output
+
+        Walks the word boxes once, joining words with spaces, lines with a
+        newline and paragraph/block changes with a blank line, and collects
+        the positive word confidences in the same pass.
+
+        Args:
+            data: image_to_data DICT output
+
+        Returns:
+            Tuple of (text, confidences)
+        """
+        parts = []
+        confidences = []
+        last_block = last_par = last_line = None
+
+        for block, par, line, word, conf in zip(
+            data['block_num'], data['par_num'], data['line_num'], data['text'], data['conf']
+        ):
+            if int(conf) > 0:
+                confidences.append(int(conf))
+
+            if not word.strip():
+                continue
+
+            if last_line is not None:
+                if (block, par) != (last_block, last_par):
+                    parts.append('\n\n')
+                elif line != last_line:
+                    parts.append('\n')
+                else:
+                    parts.append(' ')
+
+            parts.append(word)
+            last_block, last_par, last_line = block, par, line
+
+        return ''.join(parts), confidences
+
+    @staticmethod
+    def _load_image(image_path: str) -> Image.Image:
+        """
+        Load an image prepared for OCR: grayscale, long edge <= OCR_MAX_EDGE
+
+        Tesseract's runtime scales with pixel count, so large scans (phone
+        photos are often 3000x4000) are downscaled first, and it binarizes
+        internally so grayscale loses nothing while halving bytes per pixel.
+        With pyvips the decode streams and the resize runs in SIMD without a
+        full RGB buffer ever being held in Python; otherwise PIL is used.
+        """
+        if PYVIPS_AVAILABLE:
+            vimage = pyvips.Image.new_from_file(image_path, access="sequential")
+            if vimage.hasalpha():
+                vimage = vimage.flatten(background=255)
+            vimage = vimage.colourspace("b-w")
+            scale = OCR_MAX_EDGE / max(vimage.width, vimage.height)
+            if scale < 1:
+                vimage = vimage.resize(scale, kernel="lanczos3")
+            buf = vimage.write_to_memory()
+            return Image.frombuffer("L", (vimage.width, vimage.height), buf, "raw", "L", 0, 1)
+
+        image = Image.open(image_path)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        scale = OCR_MAX_EDGE / max(image.size)
+        if scale < 1:
+            image = image.resize(
+                (int(image.width * scale), int(image.height * scale)),
+                Image.LANCZOS
+            )
+
+        return image.convert('L')
+
+    def extract_text_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract text from multiple images while paying Tesseract init once
+
+        With tesserocr the persistent API already amortizes startup, so the
+        batch simply iterates extract_text and keeps real per-word
+        confidences. Without it, Tesseract is invoked once over a text file
+        listing the image paths, which amortizes subprocess startup but
+        yields no confidence data (reported as 0).
+
+        Args:
+            image_paths: Paths to the image files
+
+        Returns:
+            List of result dictionaries, one per input path, in order
+        """
+        if not image_paths:
+            return []
+
+        # The persistent API (or a single image) gains nothing from the
+        # list-file mode; per-image extraction keeps confidences intact
+        if self.api is not None or len(image_paths) == 1:
+            return [self.extract_text(path) for path in image_paths]
+
+        try:
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as tmp:
+                tmp.write("\n".join(image_paths))
+                list_file = tmp.name
+
+            try:
+                output = pytesseract.image_to_string(list_file, config=self.tesseract_config)
+            finally:
+                os.unlink(list_file)
+
+            # Tesseract emits a form-feed between pages of a list-file run
+            pages = output.split('\f')
+
+            results = []
+            for i, path in enumerate(image_paths):
+                text = pages[i].strip() if i < len(pages) else ""
+                results.append({
+                    "text": text,
+                    "confidence": 0,
+                    "word_count": len(text.split()),
+                    "character_count": len(text)
+                })
+            return results
+
+        except Exception as e:
+            logger.error(f"Batch OCR extraction failed, falling back to per-image: {e}")
+            return [self.extract_text(path) for path in image_paths]
+
+
+class KeyEntities(BaseModel):
+    """Entity buckets extracted from a document"""
+    names: List[str] = Field(default_factory=list)
+    dates: List[str] = Field(default_factory=list)
+    amounts: List[str] = Field(default_factory=list)
+    other: List[str] = Field(default_factory=list)
+
+
+class DocumentAnalysis(BaseModel):
+    """Schema the model's JSON-mode response must satisfy"""
+    document_type: str
+    key_entities: KeyEntities = Field(default_factory=KeyEntities)
+    summary: str = ""
+    sentiment_score: int = 0
+
 
 class NLPService:
     """Natural Language Processing service using OpenAI"""
     
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-    
-    def analyze_document(self, text: str) -> Dict[str, Any]:
+        self.client = _OPENAI_CLIENT
+        # Throttle in-flight completions so concurrent uploads stay within
+        # the OpenAI rate limit instead of failing with 429s
+        self._semaphore = asyncio.Semaphore(_OPENAI_CONCURRENCY)
+
+    async def analyze_document(self, text: str) -> Dict[str, Any]:
         """
         Analyze document using AI to extract insights
-        
+
         Args:
             text: Document text to analyze
-            
+
         Returns:
             Dictionary containing analysis results
         """
         if not self.client:
             return self._fallback_analysis(text)
-        
+
+        prompt_text = _truncate_for_model(text)
+
+        # Identical documents (templated invoices, re-uploaded reports) hit
+        # the cache instead of re-spending tokens on the same analysis
+        cache_key = self._cache_key(prompt_text)
+        cached = await asyncio.to_thread(self._cache_get, cache_key)
+        if cached is not None:
+            logger.info("NLP cache hit")
+            return cached
+
         try:
             # Create analysis prompt
             prompt = f"""
@@ -96,7 +351,7 @@ class NLPService:
             4. Sentiment score (-100 to 100)
             
             Document text:
-            {text[:4000]}  # Limit to avoid token limits
+            {prompt_text}
             
             Respond in JSON format:
             {{
@@ -107,24 +362,60 @@ class NLPService:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert document analyst. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1000
-            )
-            
-            # Parse response
-            result = json.loads(response.choices[0].message.content)
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are an expert document analyst. Always respond with valid JSON."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=1000,
+                    response_format={"type": "json_object"}
+                )
+
+            # JSON mode guarantees well-formed JSON; validating the schema
+            # makes shape-wrong responses fall back immediately instead of
+            # propagating half-filled results downstream
+            analysis = DocumentAnalysis.model_validate_json(response.choices[0].message.content)
+            result = analysis.model_dump()
+            await asyncio.to_thread(self._cache_put, cache_key, result)
             return result
-            
+
         except Exception as e:
             logger.error(f"NLP analysis failed: {e}")
             return self._fallback_analysis(text)
-    
+
+    @staticmethod
+    def _cache_key(prompt_text: str) -> str:
+        """Hash the normalized text that is actually sent to the model"""
+        return hashlib.blake2b(prompt_text.strip().lower().encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+        """Look up a memoized analysis result; cache errors are non-fatal"""
+        db = SessionLocal()
+        try:
+            entry = db.query(NLPCache).filter(NLPCache.key == key).first()
+            return entry.result if entry else None
+        except Exception as e:
+            logger.warning(f"NLP cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _cache_put(key: str, result: Dict[str, Any]):
+        """Store an analysis result under its content hash"""
+        db = SessionLocal()
+        try:
+            db.merge(NLPCache(key=key, result=result))
+            db.commit()
+        except Exception as e:
+            logger.warning(f"NLP cache store failed: {e}")
+        finally:
+            db.close()
+
     def _fallback_analysis(self, text: str) -> Dict[str, Any]:
         """Fallback analysis when OpenAI is not available"""
         # Simple regex-based analysis
@@ -141,19 +432,16 @@ class NLPService:
         }
     
     def _detect_document_type(self, text: str) -> str:
-        """Detect document type using keywords"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['invoice', 'bill', 'payment', 'amount due']):
-            return "invoice"
-        elif any(word in text_lower for word in ['contract', 'agreement', 'terms', 'conditions']):
-            return "contract"
-        elif any(word in text_lower for word in ['report', 'analysis', 'findings', 'conclusion']):
-            return "report"
-        elif any(word in text_lower for word in ['resume', 'cv', 'curriculum vitae', 'experience']):
-            return "resume"
-        else:
-            return "general_document"
+        """Detect document type using keywords, scanning the text once"""
+        best = None
+        for match in _DOCUMENT_TYPE_RE.finditer(text):
+            priority, doc_type = _KEYWORD_TO_TYPE[match.group(0).lower()]
+            if best is None or priority < best[0]:
+                best = (priority, doc_type)
+                if priority == 0:
+                    break
+
+        return best[1] if best else "general_document"
     
     def _extract_entities_regex(self, text: str) -> Dict[str, List[str]]:
         """Extract entities using regex patterns"""
@@ -164,18 +452,18 @@ class NLPService:
             "other": []
         }
         
+        # dict.fromkeys dedups in one streaming pass over finditer and, unlike
+        # a set round-trip, keeps matches in document order
+
         # Extract dates (various formats)
-        date_pattern = r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b'
-        entities["dates"] = list(set(re.findall(date_pattern, text)))
-        
+        entities["dates"] = list(dict.fromkeys(m.group(0) for m in _DATE_RE.finditer(text)))
+
         # Extract amounts (currency)
-        amount_pattern = r'\$[\d,]+\.?\d*|\b\d+\.\d{2}\b'
-        entities["amounts"] = list(set(re.findall(amount_pattern, text)))
-        
+        entities["amounts"] = list(dict.fromkeys(m.group(0) for m in _AMOUNT_RE.finditer(text)))
+
         # Extract email addresses
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        entities["other"] = list(set(re.findall(email_pattern, text)))
-        
+        entities["other"] = list(dict.fromkeys(m.group(0) for m in _EMAIL_RE.finditer(text)))
+
         return entities
     
     def _generate_summary(self, text: str) -> str:
@@ -187,13 +475,19 @@ class NLPService:
     
     def _calculate_sentiment(self, text: str) -> int:
         """Calculate simple sentiment score"""
-        positive_words = ['good', 'great', 'excellent', 'positive', 'success', 'happy', 'pleased']
-        negative_words = ['bad', 'terrible', 'negative', 'failure', 'unhappy', 'disappointed', 'problem']
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        
+        # One pass over the text, counting each distinct keyword once
+        positive_seen = set()
+        negative_seen = set()
+        for match in _SENTIMENT_RE.finditer(text):
+            word = match.group(0).lower()
+            if word in _POSITIVE_WORDS:
+                positive_seen.add(word)
+            else:
+                negative_seen.add(word)
+
+        positive_count = len(positive_seen)
+        negative_count = len(negative_seen)
+
         if positive_count > negative_count:
             return min(100, (positive_count - negative_count) * 20)
         elif negative_count > positive_count:
@@ -204,19 +498,35 @@ class NLPService:
 
 class DocumentProcessor:
     """Main document processing orchestrator"""
-    
+
     def __init__(self):
         self.ocr_service = OCRService()
         self.nlp_service = NLPService()
-    
-    def process_document(self, file_path: str, mime_type: str) -> Dict[str, Any]:
+        self._pool = None
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Process pool for CPU-bound OCR work, one worker per CPU core
+
+        Created lazily so worker processes building their own services
+        never spawn pools of their own.
+        """
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+        return self._pool
+
+    async def process_document(self, file_path: str, mime_type: str) -> Dict[str, Any]:
         """
         Process a document through the complete pipeline
-        
+
+        OCR runs in the process pool; the NLP call is awaited directly so
+        concurrent documents overlap on the OpenAI round-trip.
+
         Args:
             file_path: Path to the document file
             mime_type: MIME type of the file
-            
+
         Returns:
             Dictionary containing all processing results
         """
@@ -232,7 +542,8 @@ class DocumentProcessor:
             # Step 1: OCR (if image)
             if mime_type.startswith('image/'):
                 logger.info("Processing image with OCR")
-                ocr_result = self.ocr_service.extract_text(file_path)
+                loop = asyncio.get_running_loop()
+                ocr_result = await loop.run_in_executor(self.pool, ocr_worker, file_path)
                 result["ocr_result"] = ocr_result
                 result["steps_completed"].append("ocr")
                 
@@ -242,15 +553,16 @@ class DocumentProcessor:
                 
                 text = ocr_result["text"]
             else:
-                # For text files, read directly
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+                # For text files, read the bytes off the event loop and
+                # decode once instead of a blocking text-mode read
+                data = await asyncio.to_thread(Path(file_path).read_bytes)
+                text = data.decode('utf-8', errors='replace')
                 result["steps_completed"].append("text_extraction")
             
             # Step 2: NLP Analysis
             if text.strip():
                 logger.info("Performing NLP analysis")
-                nlp_result = self.nlp_service.analyze_document(text)
+                nlp_result = await self.nlp_service.analyze_document(text)
                 result["nlp_result"] = nlp_result
                 result["steps_completed"].append("nlp_analysis")
             else:
@@ -277,3 +589,24 @@ class DocumentProcessor:
             result["processing_completed_at"] = datetime.now().isoformat()
         
         return result
+
+
+# Per-process singleton used by pool workers: each worker process builds its
+# own OCRService once (with its own Tesseract instance) and reuses it
+_worker_ocr_service: Optional[OCRService] = None
+
+
+def ocr_worker(file_path: str) -> Dict[str, Any]:
+    """OCR entry point for ProcessPoolExecutor workers"""
+    global _worker_ocr_service
+    if _worker_ocr_service is None:
+        _worker_ocr_service = OCRService()
+    return _worker_ocr_service.extract_text(file_path)
+
+
+def ocr_batch_worker(file_paths: List[str]) -> List[Dict[str, Any]]:
+    """Batch OCR entry point for ProcessPoolExecutor workers"""
+    global _worker_ocr_service
+    if _worker_ocr_service is None:
+        _worker_ocr_service = OCRService()
+    return _worker_ocr_service.extract_text_batch(file_paths)
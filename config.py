@@ -1,6 +1,12 @@
 import os
 from typing import Optional
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# Limit Tesseract's internal OpenMP threading to one thread per process;
+# parallelism comes from running one worker process per CPU core instead,
+# which avoids oversubscription. Must be set before Tesseract ever runs,
+# and config is imported before any OCR code.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
 
 class Settings(BaseSettings):
@@ -9,6 +15,7 @@ class Settings(BaseSettings):
     
     # OpenAI Configuration (optional)
     openai_api_key: Optional[str] = None
+    openai_concurrency: int = 8  # max in-flight chat completions
     
     # Application Configuration
     secret_key: str = "your-secret-key-change-in-production"
@@ -20,8 +27,9 @@ class Settings(BaseSettings):
     processed_dir: str = "./processed"
     max_file_size: int = 10485760  # 10MB
     
-    class Config:
-        env_file = ".env"
+    # Frozen so settings are immutable after startup and attribute access
+    # stays a plain lookup with no validation on the hot path
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
 
 
 settings = Settings()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from config import settings
 from models import Base
@@ -6,11 +6,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Create database engine
+# Create database engine. The compiled_cache memoizes SQL compilation and
+# parameter-binding codegen across calls for the hot repeated statements,
+# and pre-ping keeps pooled connections from failing after idle periods.
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    echo=settings.debug
+    echo=settings.debug,
+    pool_size=20,
+    pool_pre_ping=True,
+    execution_options={"compiled_cache": {}}
 )
 
 # Create session factory
@@ -21,6 +26,35 @@ def create_tables():
     """Create all database tables"""
     try:
         Base.metadata.create_all(bind=engine)
+
+        # GIN indexes only exist on Postgres; sqlite keeps its JSON columns
+        # unindexed since it stores them as text anyway
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                # Commit the index on its own so a failure in the optional
+                # ALTERs below cannot roll it back with the transaction
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_documents_entities_gin "
+                    "ON documents USING gin (key_entities)"
+                ))
+                conn.commit()
+
+                # Compress the large text columns with lz4 so TOASTed values
+                # cost less to write and read back; listing queries already
+                # avoid these columns entirely via the narrow Core select.
+                # SET COMPRESSION needs Postgres 14+, so treat it as optional
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE documents ALTER COLUMN extracted_text SET COMPRESSION lz4"
+                    ))
+                    conn.execute(text(
+                        "ALTER TABLE documents ALTER COLUMN summary SET COMPRESSION lz4"
+                    ))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.warning(f"Could not set column compression: {e}")
+
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
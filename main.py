@@ -1,28 +1,44 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
+import orjson
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import asyncio
 import os
 import uuid
-import shutil
 import logging
 from datetime import datetime
 
 from database import get_db, init_database
-from models import Document
-from ai_services import DocumentProcessor
+from models import Document, document_default
+from ai_services import DocumentProcessor, ocr_batch_worker
 from config import settings
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, settings.log_level))
 logger = logging.getLogger(__name__)
 
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson
+
+    Serializes datetime objects natively in C, and Document instances
+    directly via the document_default hook, so handlers can return ORM
+    objects without building intermediate dicts.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=document_default)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Document Processor",
     description="Intelligent document processing with OCR and NLP",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -37,6 +53,33 @@ app.add_middleware(
 # Initialize document processor
 processor = DocumentProcessor()
 
+# OCR micro-batching: uploaded images are enqueued here and a single consumer
+# coalesces them into batches for OCRService.extract_text_batch, so a burst
+# of uploads pays Tesseract startup once instead of once per image
+ocr_queue: asyncio.Queue = asyncio.Queue()
+OCR_BATCH_SIZE = 32
+OCR_BATCH_WINDOW = 0.25  # seconds to wait for more uploads before dispatching
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # stream uploads to disk 1 MB at a time
+
+# Rendered listing rows keyed by (id, updated_at). updated_at changes on
+# every mutation, so a stale entry is simply never looked up again;
+# the cache is cleared wholesale once it fills
+_row_render_cache: dict = {}
+ROW_RENDER_CACHE_MAX = 4096
+
+
+def render_document_row(row) -> bytes:
+    """Serialize one listing row to JSON bytes, memoized per row version"""
+    key = (row["id"], row["updated_at"])
+    rendered = _row_render_cache.get(key)
+    if rendered is None:
+        rendered = orjson.dumps(dict(row))
+        if len(_row_render_cache) >= ROW_RENDER_CACHE_MAX:
+            _row_render_cache.clear()
+        _row_render_cache[key] = rendered
+    return rendered
+
 # Create directories
 os.makedirs(settings.upload_dir, exist_ok=True)
 os.makedirs(settings.processed_dir, exist_ok=True)
@@ -46,6 +89,7 @@ os.makedirs(settings.processed_dir, exist_ok=True)
 async def startup_event():
     """Initialize database on startup"""
     init_database()
+    asyncio.create_task(ocr_batch_consumer())
     logger.info("AI Document Processor started successfully")
 
 
@@ -96,27 +140,38 @@ async def upload_document(
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
         
-        if file.size > settings.max_file_size:
+        if file.size and file.size > settings.max_file_size:
             raise HTTPException(
-                status_code=413, 
+                status_code=413,
                 detail=f"File too large. Maximum size: {settings.max_file_size} bytes"
             )
-        
+
         # Generate unique filename
         file_extension = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = os.path.join(settings.upload_dir, unique_filename)
-        
-        # Save uploaded file
+
+        # Stream the upload to disk in chunks so the event loop is never
+        # blocked for the full write, enforcing the size cap as bytes arrive
+        bytes_written = 0
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                bytes_written += len(chunk)
+                if bytes_written > settings.max_file_size:
+                    buffer.close()
+                    os.remove(file_path)
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size: {settings.max_file_size} bytes"
+                    )
+                await asyncio.to_thread(buffer.write, chunk)
+
         # Create database record
         document = Document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=file_path,
-            file_size=file.size,
+            file_size=bytes_written,
             mime_type=file.content_type or "application/octet-stream",
             status="pending"
         )
@@ -125,8 +180,13 @@ async def upload_document(
         db.commit()
         db.refresh(document)
         
-        # Start background processing
-        background_tasks.add_task(process_document_task, document.id, file_path, file.content_type)
+        # Start background processing: images go through the batching OCR
+        # queue, everything else keeps the per-document task
+        mime_type = file.content_type or "application/octet-stream"
+        if mime_type.startswith("image/"):
+            await ocr_queue.put((document.id, file_path, mime_type))
+        else:
+            background_tasks.add_task(process_document_task, document.id, file_path, mime_type)
         
         logger.info(f"Document uploaded successfully: {document.id}")
         
@@ -137,7 +197,9 @@ async def upload_document(
             "status": "processing",
             "estimated_completion": "2-5 minutes"
         }
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
@@ -163,20 +225,30 @@ async def list_documents(
         List of documents
     """
     try:
-        query = db.query(Document)
-        
-        if status:
-            query = query.filter(Document.status == status)
-        
-        documents = query.offset(skip).limit(limit).all()
-        
-        return {
-            "documents": [doc.to_dict() for doc in documents],
-            "total": len(documents),
-            "skip": skip,
-            "limit": limit
-        }
-        
+        def run_queries():
+            # Listing only needs the summary columns: the Core row query
+            # skips ORM hydration and leaves the large text/JSON blobs on disk
+            count_query = db.query(func.count(Document.id))
+            if status:
+                count_query = count_query.filter(Document.status == status)
+
+            return count_query.scalar(), Document.list_rows(db, skip=skip, limit=limit, status=status)
+
+        total, rows = await asyncio.to_thread(run_queries)
+
+        # Stream the per-row cached bytes instead of concatenating one big
+        # body: memory stays bounded at a row and the first byte goes out
+        # immediately; on cache hits neither dict-building nor orjson runs
+        async def body_stream():
+            yield b'{"documents":['
+            separator = b""
+            for row in rows:
+                yield separator + render_document_row(row)
+                separator = b","
+            yield f'],"total":{total},"skip":{skip},"limit":{limit}}}'.encode()
+
+        return StreamingResponse(body_stream(), media_type="application/json")
+
     except Exception as e:
         logger.error(f"Failed to list documents: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list documents: {str(e)}")
@@ -185,26 +257,41 @@ async def list_documents(
 @app.get("/documents/{document_id}")
 async def get_document(
     document_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Get a specific document by ID
-    
+
+    Supports conditional GET: responses carry a weak ETag derived from
+    updated_at, and a matching If-None-Match returns 304 so status polling
+    clients skip the re-serialization and the response body entirely.
+
     Args:
         document_id: The document ID
+        request: The incoming request (for If-None-Match)
         db: Database session
-        
+
     Returns:
-        Document details
+        Document details, or 304 Not Modified
     """
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
-        
+        document = db.get(Document, document_id)
+
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
-        
-        return document.to_dict()
-        
+
+        etag = None
+        if document.updated_at:
+            etag = f'W/"{document.id}-{int(document.updated_at.timestamp())}"'
+            if request.headers.get("if-none-match") == etag:
+                # RFC 9110: a 304 repeats the validator so shared caches
+                # can refresh their stored entry
+                return Response(status_code=304, headers={"ETag": etag})
+
+        headers = {"ETag": etag} if etag else None
+        return ORJSONResponse(content=document, headers=headers)
+
     except HTTPException:
         raise
     except Exception as e:
@@ -228,18 +315,18 @@ async def get_document_results(
         Document processing results
     """
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = db.get(Document, document_id)
         
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
         if document.status != "completed":
-            return {
+            return ORJSONResponse(content={
                 "status": document.status,
                 "message": "Document processing not completed yet"
-            }
-        
-        return {
+            })
+
+        return ORJSONResponse(content={
             "document_id": document.id,
             "status": document.status,
             "extracted_text": document.extracted_text,
@@ -252,8 +339,8 @@ async def get_document_results(
             "processing_time": (
                 document.processing_completed_at - document.processing_started_at
             ).total_seconds() if document.processing_started_at and document.processing_completed_at else None
-        }
-        
+        })
+
     except HTTPException:
         raise
     except Exception as e:
@@ -277,7 +364,7 @@ async def delete_document(
         Deletion confirmation
     """
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = db.get(Document, document_id)
         
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
@@ -304,6 +391,128 @@ async def delete_document(
         raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
 
 
+async def ocr_batch_consumer():
+    """
+    Background consumer that micro-batches queued image documents
+
+    Blocks on the first queued item, then collects up to OCR_BATCH_SIZE more
+    within OCR_BATCH_WINDOW seconds and dispatches the whole batch to a
+    single Tesseract run.
+    """
+    while True:
+        try:
+            batch = [await ocr_queue.get()]
+            while len(batch) < OCR_BATCH_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(ocr_queue.get(), timeout=OCR_BATCH_WINDOW))
+                except asyncio.TimeoutError:
+                    break
+
+            document_ids = [document_id for document_id, _, _ in batch]
+            file_paths = [file_path for _, file_path, _ in batch]
+
+            await asyncio.to_thread(mark_documents_processing, document_ids)
+
+            # Split the batch into contiguous chunks, one per pool worker:
+            # each worker process holds its own persistent Tesseract capped
+            # at one OpenMP thread, so OCR throughput scales with cores
+            # instead of serializing on a single thread here
+            logger.info(f"Running OCR batch of {len(batch)} document(s)")
+            chunk_count = min(len(file_paths), os.cpu_count() or 1)
+            chunk_size = (len(file_paths) + chunk_count - 1) // chunk_count
+            chunks = [file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size)]
+
+            loop = asyncio.get_running_loop()
+            chunk_results = await asyncio.gather(*(
+                loop.run_in_executor(processor.pool, ocr_batch_worker, chunk)
+                for chunk in chunks
+            ))
+            ocr_results = [result for chunk_result in chunk_results for result in chunk_result]
+
+            # Fan out NLP + persistence for the whole batch concurrently so
+            # the OpenAI round-trips overlap up to the NLP semaphore width
+            await asyncio.gather(*(
+                finish_ocr_document(document_id, ocr_result)
+                for (document_id, _, _), ocr_result in zip(batch, ocr_results)
+            ))
+
+        except Exception as e:
+            logger.error(f"OCR batch consumer error: {e}")
+
+
+async def finish_ocr_document(document_id: int, ocr_result: dict):
+    """Run NLP analysis on one batched OCR result and persist the outcome"""
+    text = ocr_result.get("text", "")
+    nlp_result = None
+    if not ocr_result.get("error") and text.strip():
+        nlp_result = await processor.nlp_service.analyze_document(text)
+    await asyncio.to_thread(finish_ocr_document_task, document_id, ocr_result, nlp_result)
+
+
+def mark_documents_processing(document_ids: List[int]):
+    """Mark a batch of documents as processing before OCR starts"""
+    db = next(get_db())
+    try:
+        db.query(Document).filter(Document.id.in_(document_ids)).update(
+            {"status": "processing", "processing_started_at": datetime.now()},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to mark documents as processing: {e}")
+    finally:
+        db.close()
+
+
+def finish_ocr_document_task(document_id: int, ocr_result: dict, nlp_result: Optional[dict]):
+    """
+    Persist the outcome of a batched OCR + NLP run
+
+    Args:
+        document_id: The document ID
+        ocr_result: Result dictionary from OCRService
+        nlp_result: NLP analysis results, or None if OCR yielded no text
+    """
+    db = next(get_db())
+    try:
+        document = db.get(Document, document_id)
+        if not document:
+            logger.error(f"Document not found: {document_id}")
+            return
+
+        text = ocr_result.get("text", "")
+        if nlp_result is None:
+            document.status = "failed"
+            document.processing_completed_at = datetime.now()
+            db.commit()
+            return
+
+        document.status = "completed"
+        document.processing_completed_at = datetime.now()
+        document.extracted_text = text
+        document.confidence_score = ocr_result.get("confidence")
+        document.document_type = nlp_result.get("document_type")
+        document.key_entities = nlp_result.get("key_entities")
+        document.summary = nlp_result.get("summary")
+        document.sentiment_score = nlp_result.get("sentiment_score")
+        db.commit()
+
+        logger.info(f"Document processing completed: {document_id} - Status: {document.status}")
+
+    except Exception as e:
+        logger.error(f"Document processing failed for {document_id}: {e}")
+        try:
+            document = db.get(Document, document_id)
+            if document:
+                document.status = "failed"
+                document.processing_completed_at = datetime.now()
+                db.commit()
+        except Exception as update_error:
+            logger.error(f"Failed to update document status: {update_error}")
+    finally:
+        db.close()
+
+
 async def process_document_task(document_id: int, file_path: str, mime_type: str):
     """
     Background task to process a document
@@ -317,7 +526,7 @@ async def process_document_task(document_id: int, file_path: str, mime_type: str
     
     try:
         # Update document status
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = db.get(Document, document_id)
         if not document:
             logger.error(f"Document not found: {document_id}")
             return
@@ -326,9 +535,10 @@ async def process_document_task(document_id: int, file_path: str, mime_type: str
         document.processing_started_at = datetime.now()
         db.commit()
         
-        # Process the document
+        # Process the document: OCR is offloaded to the process pool inside
+        # the pipeline, the NLP call overlaps with other documents
         logger.info(f"Starting processing for document {document_id}")
-        result = processor.process_document(file_path, mime_type)
+        result = await processor.process_document(file_path, mime_type)
         
         # Update document with results
         if result["status"] == "completed":
@@ -354,7 +564,7 @@ async def process_document_task(document_id: int, file_path: str, mime_type: str
         
         # Update document status to failed
         try:
-            document = db.query(Document).filter(Document.id == document_id).first()
+            document = db.get(Document, document_id)
             if document:
                 document.status = "failed"
                 document.processing_completed_at = datetime.now()
@@ -1,15 +1,54 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Text, JSON, Boolean, Index, insert, select, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 Base = declarative_base()
 
+# Generic JSON on sqlite, JSONB on Postgres: binary storage parses once at
+# write time instead of re-parsing text on every read, and supports GIN
+# indexing for server-side containment queries
+JSONVariant = JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+# Serialized Document fields, hoisted to module level so serialization
+# iterates a constant tuple instead of rebuilding literal keys per call
+_FIELDS = (
+    "id", "filename", "original_filename", "file_size", "mime_type",
+    "status", "processing_started_at", "processing_completed_at",
+    "extracted_text", "structured_data", "confidence_score",
+    "document_type", "key_entities", "summary", "sentiment_score",
+    "created_at", "updated_at",
+)
+
+
+class NLPCache(Base):
+    """Memoized NLP analysis results keyed by a hash of the analyzed text"""
+    __tablename__ = "nlp_cache"
+
+    key = Column(String(32), primary_key=True)
+    result = Column(JSONVariant, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
 
 class Document(Base):
     __tablename__ = "documents"
-    
+    __table_args__ = (
+        # Backs the common status-filtered listings ordered by recency
+        Index("ix_documents_status_created", "status", "created_at"),
+        # Backs type-filtered queries
+        Index("ix_documents_document_type", "document_type"),
+        # Partial index for the worker-queue scan; completed rows dominate
+        # the table over time, so this stays tiny
+        Index(
+            "ix_documents_queue",
+            "status", "created_at",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+            sqlite_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
     original_filename = Column(String(255), nullable=False)
@@ -24,36 +63,73 @@ class Document(Base):
     
     # Extracted content
     extracted_text = Column(Text)
-    structured_data = Column(JSON)
-    confidence_score = Column(Integer)  # 0-100
+    structured_data = Column(JSONVariant)
+    confidence_score = Column(SmallInteger)  # 0-100
     
     # AI analysis results
     document_type = Column(String(100))
-    key_entities = Column(JSON)
+    key_entities = Column(JSONVariant)
     summary = Column(Text)
-    sentiment_score = Column(Integer)  # -100 to 100
+    sentiment_score = Column(SmallInteger)  # -100 to 100
     
     # Metadata
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "id": self.id,
-            "filename": self.filename,
-            "original_filename": self.original_filename,
-            "file_size": self.file_size,
-            "mime_type": self.mime_type,
-            "status": self.status,
-            "processing_started_at": self.processing_started_at.isoformat() if self.processing_started_at else None,
-            "processing_completed_at": self.processing_completed_at.isoformat() if self.processing_completed_at else None,
-            "extracted_text": self.extracted_text,
-            "structured_data": self.structured_data,
-            "confidence_score": self.confidence_score,
-            "document_type": self.document_type,
-            "key_entities": self.key_entities,
-            "summary": self.summary,
-            "sentiment_score": self.sentiment_score,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-        }
+    @classmethod
+    def bulk_create(cls, session, rows: List[Dict[str, Any]], batch_size: int = 1000):
+        """
+        Insert many documents with Core executemany in batches
+
+        Each batch is one round-trip and one statement compile instead of a
+        per-row ORM flush. Meant for bulk ingest; paths that need the
+        generated ids back should keep using session.add.
+        """
+        table = cls.__table__
+        for start in range(0, len(rows), batch_size):
+            session.execute(insert(table), rows[start:start + batch_size])
+            session.commit()
+
+    @classmethod
+    def list_rows(cls, session, skip: int = 0, limit: int = 100, status: str = None):
+        """
+        Fetch listing rows with a Core select, skipping ORM materialization
+
+        Returns dict-like RowMapping objects holding only the summary
+        columns, with none of the per-object identity-map and descriptor
+        overhead full Document instances carry. Use the ORM for single-row
+        update paths where change tracking matters.
+        """
+        table = cls.__table__
+        stmt = select(
+            table.c.id,
+            table.c.filename,
+            table.c.original_filename,
+            table.c.file_size,
+            table.c.mime_type,
+            table.c.status,
+            table.c.document_type,
+            table.c.confidence_score,
+            table.c.created_at,
+            table.c.updated_at,
+        )
+
+        if status:
+            stmt = stmt.where(table.c.status == status)
+
+        return session.execute(stmt.offset(skip).limit(limit)).mappings().all()
+
+
+def document_default(obj):
+    """
+    orjson `default` hook that serializes Document instances directly
+
+    Reads loaded values straight from __dict__, skipping SQLAlchemy's
+    InstrumentedAttribute descriptors, and hands orjson the field mapping
+    without an intermediate to_dict call site per endpoint. Datetimes pass
+    through as-is for orjson's C-level RFC 3339 emission.
+    """
+    if isinstance(obj, Document):
+        d = obj.__dict__
+        return {key: d.get(key) for key in _FIELDS}
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
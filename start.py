@@ -3,21 +3,27 @@
 Quick start script for AI Document Processor
 """
 
-import subprocess
+import os
 import sys
-import time
-import webbrowser
-from pathlib import Path
 
 def check_dependencies():
     """Check if required packages are installed"""
+    # Imported here so the default exec-only start path loads nothing
+    # beyond os and sys before replacing itself with the server
+    from importlib.metadata import PackageNotFoundError, distribution
+
     required = ['fastapi', 'uvicorn', 'sqlalchemy', 'pillow', 'pytesseract']
     missing = []
-    
+
+    # Consult installed-package metadata instead of importing each package:
+    # a stat per distribution rather than executing whole import graphs
+    # (SQLAlchemy and FastAPI alone cost over a second). This also checks
+    # the distribution name, so 'pillow' no longer false-negatives on its
+    # 'PIL' module name.
     for package in required:
         try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
+            distribution(package)
+        except PackageNotFoundError:
             missing.append(package)
     
     if missing:
@@ -31,23 +37,22 @@ def check_dependencies():
 def main():
     print("AI Document Processor - Quick Start")
     print("=" * 50)
-    
-    if not check_dependencies():
+
+    # Dependency probing is opt-in so the common "just start" path goes
+    # straight into the exec below
+    if os.environ.get("CHECK_DEPS") and not check_dependencies():
         return
-    
+
     print("\nStarting server...")
     print("Server will be at: http://localhost:8000")
     print("API docs will be at: http://localhost:8000/docs")
     print("Press Ctrl+C to stop")
     print("-" * 50)
-    
-    try:
-        # Start the server
-        subprocess.run([sys.executable, "main.py"])
-    except KeyboardInterrupt:
-        print("\nServer stopped")
-    except Exception as e:
-        print(f"Error: {e}")
+
+    # Replace this process with the server instead of shepherding a child:
+    # Ctrl+C and other signals reach uvicorn directly, and no idle parent
+    # interpreter sits around holding memory and file descriptors
+    os.execv(sys.executable, [sys.executable, "main.py"])
 
 if __name__ == "__main__":
     main()